@@ -1,4 +1,4 @@
-#!/usr/local/bin/python3.7
+#!/usr/local/bin/python3.8
 # -*- coding: utf-8 -*-
 ###############################################################################
 #
@@ -27,39 +27,87 @@
 """It's the module for web scraping. The module uses different sources and APIs for web-scraping"""
 
 import os
+import asyncio
+import aiohttp
 import requests
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from pathlib import Path
 import json
+import orjson
 from decouple import config
-from langdetect import detect
+from lingua import Language, LanguageDetectorBuilder
 import time
+from collections import deque
+from itertools import chain
+from functools import lru_cache
 import sqlite3
-import bs4 as bs
+from concurrent.futures import ProcessPoolExecutor
+from lxml import html
 
-def delta_date(start_date,end_date):
-    """Function that returns the number of days between 2 dates """
+def quote_identifier(name):
+    """Function that quotes a SQLite identifier (like a table name) so that it can't be read as a keyword or as
+    part of the query """
 
-    return abs((datetime.strptime(start_date, "%Y-%m-%d") - datetime.strptime(end_date, "%Y-%m-%d")).days)
+    return '"' + name.replace('"', '""') + '"'
 
-def get_tickers():
-    """Method that gets the stock symbols from companies listed in the S&P 500
+def init_session():
+    """Function that returns a HTTP session which keeps the connections alive between requests and retries
+    the requests that fail because of the server
 
     Return
     ------
-    `tickers` : list
-        S&P 500 company symbols
+    `session` : requests.Session
+        HTTP session
     """
-    resp = requests.get('http://en.wikipedia.org/wiki/List_of_S%26P_500_companies')
-    soup = bs.BeautifulSoup(resp.text, 'lxml')
-    table = soup.find_all('table')[0]  # Grab the first table
 
-    tickers = []
-    for row in table.findAll('tr')[1:]:
-        ticker = row.findAll('td')[0].text.strip('\n')
-        tickers.append(ticker)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16, max_retries=Retry(total=3, backoff_factor=0.5,
+                          status_forcelist=[429, 500, 502, 503, 504]))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_tickers(session=None, cache_path=None, cache_ttl=7*86400):
+    """Method that gets the stock symbols from companies listed in the S&P 500. The symbols are saved in a json
+    file and read from it until the file is older than `cache_ttl` as the list rarely changes
+
+    Parameters
+    ----------
+    `session` : requests.Session
+        HTTP session used to make the request. A new one is created if None
+    `cache_path` : str
+        Path of the json file where the symbols are saved. Default is 'output/sp500_tickers.json' in the directory of
+        the module
+    `cache_ttl` : int
+        Seconds during which the saved symbols are used instead of making a new request. Default is one week
 
+    Return
+    ------
+    `tickers` : list
+        S&P 500 company symbols
+    """
+    if cache_path is None:
+        cache_path = os.path.dirname(os.path.realpath(__file__)) + '/output/sp500_tickers.json'
+    cache_path = Path(cache_path)
+    if cache_path.exists() and time.time() - cache_path.stat().st_mtime < cache_ttl:
+        return json.loads(cache_path.read_text())
+
+    if session is None:
+        session = init_session()
+    resp = session.get('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies', timeout=10)
+    resp.raise_for_status()
+    tables = html.fromstring(resp.content).xpath('(//table)[1]')  # Grab the first table
+
+    #the symbol is in the first cell of each row (the header row has no 'td' cell)
+    tickers = [cell.text_content().strip() for cell in tables[0].xpath('.//tr/td[1]')] if tables else []
+    if not tickers:
+        raise Exception("No S&P 500 symbol found on the Wikipedia page. The symbols are not saved")
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(json.dumps(tickers))
     return tickers
 
 class Init():
@@ -143,24 +191,50 @@ class FinnHub():
         `self.max_call` : int
             maximum api calls per minute for the finhub API
         `self.time_sleep` : int
-            seconds to sleep before making a new API call. Default is 60 seconds as the maximum number of API calls is
-            per minute
-        `self.nb_request` : int
-            nb of request made so far. Set to 0 in constructor `__init__` as we may loop through ticker
-            and want to avoid the variable to reset to 0 when exiting the wrapper `iterate_day()` (which could generate
-            an error)
+            period in seconds over which `self.max_call` applies. Default is 60 seconds as the maximum number of API
+            calls is per minute
+        `self.nb_workers` : int
+            number of processes among which the tickers are distributed. At most `self.max_call`
+        `self.worker_max_call` : int
+            maximum api calls per minute for each process. `self.max_call` is shared between the processes as the
+            limit applies to the API key
         `self.finhub_key` : str
             finhub unique API key. Get yours here : https://finnhub.io/
+        `self.timeout` : int
+            seconds before a request to the Finnhub API times out
+        `self.max_attempts` : int
+            maximum number of attempts for a request to the Finnhub API that fails with a 429 or 5xx status, a
+            timeout or a connection error
         `self.db_name : str
             default file name for the sql database
+        `self.languages` : list
+            languages the detector can choose from. The only decision is whether a headline is in english, so the
+            detector is limited to english and the languages most often found in the news instead of loading the
+            models of all the languages
+        `self.insert_sql` : str
+            template of the query that inserts the news in a table. The name of the table is formatted once per ticker
+            in `self.sql`
+        `self.batch_size` : int
+            number of rows written to the database at a time while the news are received from the Finnhub API
+        `self.detector` : lingua.LanguageDetector
+            language detector used to remove the non-english headlines. Built once as it loads the language models
+        `self.lang_cache_size` : int
+            number of language detection results kept in the cache of `self.is_english()`. The headlines of a ticker
+            are unique, but the same headline can come back for many tickers processed by the same process
+        `self.conn` : database object
+            Connection to the sql database, opened for each ticker and shared by all the methods decorated with
+            `init_sql`. It is in autocommit mode so that the transactions are only managed by `init_sql`
         """
 
         #Initialize attributes values here
         self.max_call = 60
         self.time_sleep = 60
-        self.nb_request = 0
         self.finhub_key = config('FINHUB_KEY')
+        self.timeout = 10
+        self.max_attempts = 5
         self.news_header = ['category', 'datetime','headline','id','image','related','source','summary','url']
+        self.insert_sql = 'INSERT OR IGNORE INTO {} VALUES (' + ','.join(['?']*len(self.news_header)) + ')'
+        self.batch_size = 10000
         self.start_date = start_date
         self.end_date = end_date
         self.tickers = tickers
@@ -168,7 +242,9 @@ class FinnHub():
                                     #database
         self.dir_path = dir_path
         self.db_name = db_name
-        self.js_data = []
+        self.lang_cache_size = 4096
+        self.init_detector()
+        self.conn = None
 
         self.start_date_ = start_date_ #datetime object
         self.end_date_ = end_date_ #datetime object
@@ -176,30 +252,111 @@ class FinnHub():
         #call the methods to access historical financial headlines
         #tickers = get_tickers() #get_tickers is to get tickers from all the companies listedin the s&p 500
 
-        for ticker_ in self.tickers:
-            self.js_data.clear()
-            self.ticker = ticker_ + '_'
-            self.ticker_request = ticker_
-            self.req_new()
+        if not self.tickers:
+            return
+
+        #each ticker has its own table, so the tickers are processed in parallel. There are no more processes than
+        #`self.max_call` so that each one can make at least one call per minute within the limit of the API key
+        self.nb_workers = min(len(self.tickers), os.cpu_count() or 1, self.max_call)
+        self.worker_max_call = self.max_call // self.nb_workers
+
+        if self.nb_workers > 1:
+            #each process gets its own copy of the instance once, not once per ticker
+            with ProcessPoolExecutor(max_workers=self.nb_workers, initializer=init_worker,
+                                     initargs=(self,)) as executor:
+                list(executor.map(process_ticker, self.tickers))
+        else:
+            for ticker_ in self.tickers:
+                self.process_ticker(ticker_)
+
+    def __getstate__(self):
+        """Built-in method that returns the attributes sent to the processes of `ProcessPoolExecutor` by
+        `init_worker()`. The language detector and the database connection can't be pickled, each process builds its
+        own"""
+
+        state = self.__dict__.copy()
+        del state['languages'], state['detector'], state['is_english'], state['conn']
+        return state
+
+    def __setstate__(self, state):
+        """Built-in method that restores the attributes in the processes of `ProcessPoolExecutor`"""
+
+        self.__dict__.update(state)
+        self.init_detector()
+        self.conn = None
+
+    def init_detector(self):
+        """ Method that builds the language detector `self.detector` used to remove the non-english headlines and
+        `self.is_english()`, which caches the results of `_is_english()` for the life of the process"""
+
+        self.languages = [Language.ENGLISH, Language.FRENCH, Language.GERMAN, Language.SPANISH, Language.PORTUGUESE,
+                          Language.ITALIAN, Language.DUTCH, Language.RUSSIAN, Language.CHINESE, Language.JAPANESE,
+                          Language.KOREAN]
+        self.detector = LanguageDetectorBuilder.from_languages(*self.languages).build()
+        self.is_english = lru_cache(maxsize=self.lang_cache_size)(self._is_english)
+
+    def process_ticker(self,ticker_):
+        """ Method that gets the news of a ticker and writes them in its own table of the sql database
+
+        Parameters
+        ----------
+        `ticker_` : str
+            Ticker symbol
+        """
+
+        self.ticker = ticker_ + '_'
+        self.ticker_request = ticker_
+        self.init_queries()
+
+        self.conn = sqlite3.connect(self.dir_path + self.db_name + '.db', isolation_level=None)
+        self.conn.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY; "
+                                "PRAGMA cache_size=-65536; PRAGMA busy_timeout=5000;")
+        try :
             self.create_table()
-            self.clean_table()
-            self.lang_review()
+            try :
+                self.req_new()
+            finally:
+                #the news written before a failed request are reviewed as well
+                self.lang_review()
+        finally:
+            self.conn.close()
+
+    def init_queries(self):
+        """ Method that builds the sql queries on the table of the current ticker in `self.sql`. They are built once
+        per ticker so that the same query strings are reused (and found in the statement cache of sqlite3)"""
+
+        table_ = quote_identifier(self.ticker)
+        self.sql = {
+            'drop' : f'DROP TABLE IF EXISTS {table_}',
+            'create' : f"CREATE TABLE IF NOT EXISTS {table_} ({self.news_header[0]} TEXT, "
+                       f"{self.news_header[1]} INTEGER NOT NULL CHECK(trim({self.news_header[1]}) <> ''), "
+                       f"{self.news_header[2]} TEXT NOT NULL CHECK(trim({self.news_header[2]}) <> ''), "
+                       f"{self.news_header[3]} INTEGER, {self.news_header[4]} TEXT, {self.news_header[5]} TEXT, "
+                       f"{self.news_header[6]} TEXT, {self.news_header[7]} TEXT, {self.news_header[8]} TEXT, "
+                       f"UNIQUE({self.news_header[2]}))",
+            'insert' : self.insert_sql.format(table_),
+            'select_headline' : f"SELECT rowid, {self.news_header[2]} FROM {table_}",
+            'delete_rowid' : f"DELETE FROM {table_} WHERE rowid = ?"
+        }
 
     def init_sql(func):
-        """ Decorator that open the sql database, save it and close it. The operation are between the opening and
-        saving of the file"""
-
-        def wrapper_(self):
-            conn_ = sqlite3.connect(self.dir_path + self.db_name + '.db')
-            c = conn_.cursor()
-            func(self,conn_,c)
-            conn_.commit()
-            conn_.close()
+        """ Decorator that runs the operations on the sql database `self.conn` in a single transaction. The
+        transaction is committed if the operations succeed and rolled back otherwise. The write lock is taken when
+        the transaction begins as other processes may write in the same database"""
+
+        def wrapper_(self,*args):
+            with self.conn:
+                c = self.conn.cursor()
+                c.execute("BEGIN IMMEDIATE")
+                func(self,self.conn,c,*args)
         return wrapper_
 
     @init_sql
-    def clean_table(self,conn_,c):
-        """Method that clean the database using sqlite3
+    def create_table(self,conn_,c):
+        """ Method that creates a table in SQLite database. It creates the table  in `self.dir_path`. The
+        constraints of the table skip the entries without headline or datetime and the duplicate headlines while
+        inserting the data. As the days are requested concurrently, the entry kept for a duplicate headline is the
+        first one received, which is not necessarily the one of the earliest day
 
         Parameters
         ----------
@@ -209,21 +366,15 @@ class FinnHub():
             Cursor object
         """
 
-        #remove NULL entry (row) from headline column
-        c.execute(f" DELETE FROM {self.ticker} WHERE {self.news_header[2]} IS NULL OR "
-                  f"trim({self.news_header[2]}) = '';")
-        # remove NULL value from datetime
-        c.execute(f" DELETE FROM {self.ticker} WHERE {self.news_header[1]} IS NULL OR "
-                  f"trim({self.news_header[1]}) = '';")
-
-        #removes duplicate entries (row)
-        c.execute(f" DELETE FROM {self.ticker} WHERE rowid NOT IN (select MIN(rowid)"
-                  f"FROM {self.ticker} GROUP BY {self.news_header[2]})")
+        #create table if it does not exist
+        c.execute(self.sql['drop'])
+        c.execute(self.sql['create'])
 
     @init_sql
-    def create_table(self,conn_,c):
-        """ Method that creates a table in SQLite database. It creates the table  in `self.dir_path` and write
-        the data in it
+    def insert_rows(self,conn_,c,batch):
+        """ Method that writes news in the table of the current ticker. If a row has data that can't be inserted,
+        the rows are inserted one by one so that only the rows that fail are skipped (and printed). Other errors
+        (like a full disk) are raised so that the transaction is rolled back
 
         Parameters
         ----------
@@ -231,54 +382,45 @@ class FinnHub():
             Connection object that represents the database
         `c` : database object
             Cursor object
+        `batch` : list
+            Lists of news to write (one list per day). Each news is a tuple ordered as `self.news_header`
         """
 
-        #create table if it does not exist
-        c.execute(f'drop table if exists {self.ticker}')
-        conn_.commit()
-        c.execute(f"CREATE TABLE IF NOT EXISTS {self.ticker} ({self.news_header[0]})")
-        conn_.commit()
-
-        #add columns to the table if the columns don't exist
-        for header_ in range(len(self.news_header)-1):
-            c.execute(f"alter table {self.ticker} add column '%s' " % self.news_header[header_+1])
-            conn_.commit()
-
-        iteration = 0
-        for data_ in self.js_data:
-            iteration +=1
-            try :
-                c.execute(f'insert into {self.ticker} values (?,?,?,?,?,?,?,?,?)',[data_[self.news_header[0]],
-                          data_[self.news_header[1]],data_[self.news_header[2]],data_[self.news_header[3]],
-                        data_[self.news_header[4]],data_[self.news_header[5]],data_[self.news_header[6]],
-                          data_[self.news_header[7]],data_[self.news_header[8]]])
-            except:
-                print(f"Error at the {iteration}th ieration")
-
-            conn_.commit()
-
-    def iterate_day(func):
-        """ Decorator that makes the API call on FinHub each days between the `self.start_date`
-        and `self.end_date` """
-
-        def wrapper_(self):
-            delta_date_ = delta_date(self.start_date,self.end_date)
-            date_ = self.start_date
-            date_obj = self.start_date_
-
-            for item in range(delta_date_ + 1):
-                self.nb_request +=1
-                func(self,date_)
-                date_obj = date_obj + relativedelta(days=1)
-                date_  = date_obj.strftime("%Y-%m-%d")
-                if self.nb_request == (self.max_call-1):
-                    time.sleep(self.time_sleep)
-                    self.nb_request=0
-        return wrapper_
+        data_errors = (sqlite3.InterfaceError, sqlite3.ProgrammingError, sqlite3.IntegrityError)
+        try :
+            c.executemany(self.sql['insert'], chain.from_iterable(batch))
+        except data_errors:
+            #the rows inserted before the error are ignored the second time because of UNIQUE(headline)
+            for iteration, row_ in enumerate(chain.from_iterable(batch), 1):
+                try :
+                    c.execute(self.sql['insert'], row_)
+                except data_errors as error_:
+                    print(f"Error while inserting the {iteration}th row (headline '{row_[2]}') in {self.ticker} : "
+                          f"{error_}")
+
+    def lang_review(self):
+        """ Methods that delete non-english entries based on the 'headline' column in a SQLlite3 db. The headlines
+        are read and checked outside of a transaction, so the write lock of the database is only taken to delete
+        the entries (other processes may write in the same database)"""
+
+        list_ = []
+        c = self.conn.cursor()
+        c.arraysize = 1000
+        c.execute(self.sql['select_headline'])
+
+        #check for non-english headlines
+        while True:
+            items_ = c.fetchmany()
+            if not items_:
+                break
+            list_.extend((rowid_,) for rowid_, headline_ in items_ if not self.is_english(headline_))
+
+        #delete non-english entries (rows) by rowid once all the headlines are checked
+        self.delete_rows(list_)
 
     @init_sql
-    def lang_review(self,conn_,c):
-        """ Methods that delete non-english entries based on the 'headline' column in a SQLlite3 db
+    def delete_rows(self,conn_,c,rowids):
+        """ Method that deletes entries from the table of the current ticker
 
         Parameters
         ----------
@@ -286,30 +428,218 @@ class FinnHub():
             Connection object that represents the database
         `c` : database object
             Cursor object
+        `rowids` : list
+            Rowid of the entries to delete. Each rowid is in a tuple
         """
 
-        list_ = []
-        c.execute(f" SELECT {self.news_header[2]} FROM {self.ticker}")
+        c.executemany(self.sql['delete_rowid'], rowids)
 
-        #check for non-english headlines
-        for item_ in c:
-            if detect(item_[0]) != 'en':
-                list_.append(item_[0])
+    def _is_english(self,headline):
+        """ Method that returns True if `headline` is in english. Use `self.is_english()` to cache the result
+
+        Parameters
+        ----------
+        `headline` : str
+            Headline to check
+        """
+
+        return self.detector.detect_language_of(headline) == Language.ENGLISH
+
+    def req_new(self):
+        """ Method that makes news request(s) to the Finnhub API. It makes one request for each day between
+        `self.start_date` and `self.end_date`. The requests are sent concurrently while respecting the maximum
+        number of API calls per minute and the news are written in the database as they are received"""
+
+        delta_date_ = abs((self.end_date_ - self.start_date_).days)
+        dates = [(self.start_date_ + timedelta(days=day_)).strftime("%Y-%m-%d") for day_ in range(delta_date_ + 1)]
+        urls = ['https://finnhub.io/api/v1/company-news?symbol=' + self.ticker_request + '&from=' + date_ + '&to=' +
+                date_ + '&token=' + self.finhub_key for date_ in dates]
+
+        asyncio.run(self._gather(urls))
+
+    async def _gather(self,urls):
+        """ Coroutine that sends all the requests in `urls` through one HTTP session. The news received are passed
+        to the coroutine `writer()` through a bounded queue, so they don't all stay in memory. The requests left are
+        cancelled if a request or the writer fails
+
+        Parameters
+        ----------
+        `urls` : list
+            Urls of the requests to make to the Finnhub API
+        """
+
+        queue = asyncio.Queue(maxsize=self.worker_max_call)
+        writer_ = asyncio.ensure_future(self.writer(queue))
+        sem = asyncio.Semaphore(self.worker_max_call)
+        req_times = deque(maxlen=self.worker_max_call)
+        lock = asyncio.Lock()
+
+        try :
+            async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=64),
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+                fetches_ = [asyncio.ensure_future(self.fetch(session,url,sem,req_times,lock,queue)) for url in urls]
+                try :
+                    #the writer only stops before the end if it fails, then nothing reads the queue anymore
+                    pending_ = set(fetches_)
+                    while pending_:
+                        done_, pending_ = await asyncio.wait(pending_ | {writer_},
+                                                             return_when=asyncio.FIRST_COMPLETED)
+                        pending_.discard(writer_)
+                        for task_ in done_:
+                            task_.result() #raises the error of the request or of the writer
+                finally:
+                    for fetch_ in fetches_:
+                        fetch_.cancel()
+                    await asyncio.gather(*fetches_, return_exceptions=True)
+        except Exception as error_:
+            #the writer may have failed as well, its error is reported as only one error is raised
+            if writer_.done() and not writer_.cancelled() and writer_.exception() not in (None, error_):
+                print(f"Error while writing the news in {self.ticker} : {writer_.exception()}")
+            raise
+        finally:
+            #write what was received so far, unless the writer failed
+            if not writer_.done():
+                end_ = asyncio.ensure_future(queue.put(None))
+                await asyncio.wait({end_, writer_}, return_when=asyncio.FIRST_COMPLETED)
+                end_.cancel()
+                await writer_
+
+    async def fetch(self,session,url,sem,req_times,lock,queue):
+        """ Coroutine that makes one news request to the Finnhub API and puts the news received in `queue`. The
+        request is retried with an exponential back-off (or after the delay in the 'Retry-After' header) if the API
+        returns a 429 or 5xx status, times out or the connection fails, up to `self.max_attempts` attempts
+
+        Parameters
+        ----------
+        `session` : aiohttp.ClientSession
+            HTTP session shared by all the requests
+        `url` : str
+            Url of the request
+        `sem` : asyncio.Semaphore
+            Semaphore that limits the number of requests in flight
+        `req_times` : deque
+            Times of the last API calls, used by `rate_limit()`
+        `lock` : asyncio.Lock
+            Lock that makes the requests wait their turn in `rate_limit()`
+        `queue` : asyncio.Queue
+            Queue read by the coroutine `writer()`
+        """
+
+        async with sem:
+            for attempt_ in range(self.max_attempts):
+                await self.rate_limit(req_times,lock)
+                wait_ = 2**attempt_
+                last_attempt = attempt_ == self.max_attempts - 1
+                try :
+                    async with session.get(url) as request_:
+                        #too many requests or server error, retry later unless it's the last attempt
+                        if (request_.status == 429 or 500 <= request_.status < 600) and not last_attempt:
+                            if request_.status == 429:
+                                try :
+                                    wait_ = float(request_.headers.get('Retry-After', wait_))
+                                except ValueError:
+                                    pass
+                        else:
+                            request_.raise_for_status()
+                            data_ = orjson.loads(await request_.read())
+                            break
+                except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+                    #timeout or connection error, retry later unless it's the last attempt
+                    if last_attempt:
+                        raise
+                await asyncio.sleep(wait_)
+
+        #the API can answer with an object (like an error message) instead of a list of news
+        if not isinstance(data_, list):
+            print(f"Unexpected response for {self.ticker_request}, the day is skipped : {data_}")
+            return
+
+        rows = []
+        for iteration, news_ in enumerate(data_, 1):
+            try :
+                rows.append(tuple(news_[header_] for header_ in self.news_header))
+            except (KeyError, TypeError):
+                print(f"Error at the {iteration}th iteration")
+        await queue.put(rows)
+
+    async def rate_limit(self,req_times,lock):
+        """ Coroutine that waits until an API call can be made without exceeding `self.worker_max_call` calls over
+        the last `self.time_sleep` seconds. It only waits for the oldest call of the window to expire instead of
+        sleeping for the whole period
+
+        Parameters
+        ----------
+        `req_times` : deque
+            Times of the last API calls. Its maximum length is `self.worker_max_call`
+        `lock` : asyncio.Lock
+            Lock shared by the requests so they wait their turn
+        """
 
-        #delete non-english entries (rows)
-            query = f"DELETE FROM {self.ticker} where {self.news_header[2]} in ({','.join(['?']*len(list_))})"
-            c.execute(query, list_)
+        async with lock:
+            if len(req_times) == self.worker_max_call:
+                wait_ = self.time_sleep - (time.monotonic() - req_times[0])
+                if wait_ > 0:
+                    await asyncio.sleep(wait_)
+            req_times.append(time.monotonic())
 
-    @iterate_day
-    def req_new(self,date_):
-        """ Method that makes news request(s) to the Finnhub API"""
+    async def writer(self,queue):
+        """ Coroutine that writes the news put in `queue` by `fetch()` in the database, `self.batch_size` rows at a
+        time. It stops when it gets None from `queue`
 
-        request_ = requests.get('https://finnhub.io/api/v1/company-news?symbol=' + self.ticker_request + '&from=' +
-                                date_ + '&to=' + date_ + '&token=' + self.finhub_key)
-        self.js_data += request_.json()
+        Parameters
+        ----------
+        `queue` : asyncio.Queue
+            Queue filled by the coroutine `fetch()`
+        """
+
+        #the rows of each day are kept in their own list and chained when written, instead of being copied in a
+        #single list
+        batch = []
+        nb_rows = 0
+        while True:
+            rows = await queue.get()
+            if rows is None:
+                break
+            batch.append(rows)
+            nb_rows += len(rows)
+            if nb_rows >= self.batch_size:
+                self.insert_rows(batch)
+                batch = []
+                nb_rows = 0
+
+        if batch:
+            self.insert_rows(batch)
+
+
+worker_finnhub = None #copy of the FinnHub instance in a process of `ProcessPoolExecutor`
+
+def init_worker(finnhub_):
+    """Function that initializes a process of `ProcessPoolExecutor` with its copy of the FinnHub instance. The copy
+    (and its language detector) is made once per process and reused for all the tickers of the process
+
+    Parameters
+    ----------
+    `finnhub_` : FinnHub
+        FinnHub instance that distributes the tickers
+    """
+
+    global worker_finnhub
+    worker_finnhub = finnhub_
+
+def process_ticker(ticker_):
+    """Function that processes a ticker in a process of `ProcessPoolExecutor` with the copy of the FinnHub
+    instance made by `init_worker()`
+
+    Parameters
+    ----------
+    `ticker_` : str
+        Ticker symbol
+    """
 
+    worker_finnhub.process_ticker(ticker_)
 
-init_ = Init()
+if __name__ == '__main__':
+    init_ = Init()
 
-finhub = FinnHub(start_date=init_.start_date, end_date=init_.end_date,start_date_=init_.start_date_ ,
-                end_date_ =init_.end_date_, tickers=init_.tickers, dir_path =init_.dir_path,db_name=init_.db_name)
\ No newline at end of file
+    finhub = FinnHub(start_date=init_.start_date, end_date=init_.end_date,start_date_=init_.start_date_ ,
+                    end_date_ =init_.end_date_, tickers=init_.tickers, dir_path =init_.dir_path,db_name=init_.db_name)
\ No newline at end of file